@@ -2,14 +2,19 @@ import cv2
 import os
 import json
 import sys
+import queue
+import threading
+import zipfile
+import multiprocessing as mp
 import numpy as np
 
 # --- Configuration ---
 # 1. The main folder containing your club subfolders (e.g., IBOT_CLUB, RAFTAR)
 INPUT_FOLDER = "Dinner_checking\ID_cards"
 
-# 2. The main output folder. Subfolders will be created *inside* this.
-MARKER_OUTPUT_FOLDER = "Research_conclave\Dinner_checking/Generated_markers"
+# 2. The output archive. All markers are stored in this one (uncompressed)
+#    zip file, in one folder per club, instead of thousands of loose files.
+MARKER_ARCHIVE = "Dinner_checking/Generated_markers.zip"
 
 # 3. The name of the map file to be created
 MAP_FILE = "aruco_image_map.json"
@@ -19,18 +24,124 @@ ARUCO_DICTIONARY_TYPE = cv2.aruco.DICT_6X6_1000
 
 # 5. Size of the output marker images (in pixels)
 MARKER_SIZE_PX = 500
+
+# 6. Width of the white border added around each marker (in pixels)
+MARKER_BORDER_PX = 50
+
+# 7. PNG settings for the markers. They are pure black/white, so fast
+#    level-1 RLE compression gives almost the same file size as the default.
+PNG_WRITE_PARAMS = [
+    cv2.IMWRITE_PNG_COMPRESSION, 1,
+    cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE
+]
 # ---------------------
 
-def generate_markers_and_map_nested(input_dir, output_dir, map_filename, dict_type):
+def render_marker(aruco_dict, marker_id, pixel_index, out):
+    """
+    Renders an ArUco marker straight from the dictionary's byte list into
+    'out', without calling cv2.aruco.generateImageMarker.
+    'pixel_index' maps every output pixel row/column to its marker cell.
+    """
+    # Decode the marker's inner bits (1 = white, 0 = black)
+    bits = cv2.aruco.Dictionary.getBitsFromByteList(
+        aruco_dict.bytesList[marker_id:marker_id + 1],
+        aruco_dict.markerSize
+    )
+
+    # Surround the bits with the one-cell black ArUco frame
+    cells = np.zeros((aruco_dict.markerSize + 2, aruco_dict.markerSize + 2), dtype=np.uint8)
+    cells[1:-1, 1:-1] = bits * 255
+
+    # Nearest-neighbour upscale of the cell grid to the output size
+    out[...] = cells[pixel_index[:, None], pixel_index[None, :]]
+
+def iter_images(root, valid_extensions):
+    """
+    Recursively yields the full paths of all images under 'root'.
+    Within each folder, images come first in sorted order, then each
+    subfolder (also sorted) is walked the same way. Built on os.scandir
+    so file types come from the directory listing, not a stat() per file.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    subfolders = []
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            subfolders.append(entry.path)
+        elif entry.name.lower().endswith(valid_extensions):
+            yield entry.path
+
+    for subfolder in subfolders:
+        yield from iter_images(subfolder, valid_extensions)
+
+# --- Per-worker state (set up once in each pool process) ---
+_worker = {}
+
+def _init_worker(dict_type):
+    """
+    Pool initializer: builds the ArUco dictionary and one reusable
+    bordered canvas for this worker process.
+    """
+    aruco_dict = cv2.aruco.getPredefinedDictionary(dict_type)
+    border = MARKER_BORDER_PX
+    padded_image = np.full(
+        (MARKER_SIZE_PX + 2 * border, MARKER_SIZE_PX + 2 * border),
+        255, dtype=np.uint8
+    )
+    marker_cells = aruco_dict.markerSize + 2
+
+    _worker["aruco_dict"] = aruco_dict
+    _worker["padded_image"] = padded_image
+    _worker["marker_area"] = padded_image[border:-border, border:-border]
+    _worker["pixel_index"] = np.arange(MARKER_SIZE_PX) * marker_cells // MARKER_SIZE_PX
+
+def _generate_one(task):
+    """
+    Generates and PNG-encodes a single marker. 'task' is (marker_id, member_name).
+    Returns (marker_id, member_name, png_bytes); it is stored by the caller.
+    """
+    marker_id, member_name = task
+    render_marker(
+        _worker["aruco_dict"], marker_id,
+        _worker["pixel_index"], _worker["marker_area"]
+    )
+    ok, buf = cv2.imencode(".png", _worker["padded_image"], PNG_WRITE_PARAMS)
+    if not ok:
+        raise RuntimeError(f"Could not encode marker ID {marker_id}")
+    return marker_id, member_name, buf.tobytes()
+
+def _archive_writer(write_queue, archive, failed):
+    """
+    Writer thread: stores (member_name, png_bytes) items from the queue
+    in the open zip 'archive' until it receives None. Names that could
+    not be stored are appended to 'failed'; the thread keeps running so
+    the queue never stalls.
+    """
+    while True:
+        item = write_queue.get()
+        try:
+            if item is None:
+                return
+            member_name, png_bytes = item
+            archive.writestr(member_name, png_bytes)
+        except Exception as e:
+            failed.append(item[0])
+            print(f"   - Error saving {item[0]}: {e}")
+        finally:
+            write_queue.task_done()
+
+def generate_markers_and_map_nested(input_dir, output_archive, map_filename, dict_type):
     """
     Scans an input directory *and all its subdirectories*, generates a
-    unique ArUco marker for each image, saves the markers in a parallel
-    directory structure, and creates a JSON map.
+    unique ArUco marker for each image, stores the markers in a zip
+    archive with a parallel directory structure, and creates a JSON map.
     """
     
-    # 1. Initialize ArUco dictionary
+    # 1. Check that the ArUco module is available (opencv-contrib).
+    #    The workers build their own dictionary in _init_worker().
     try:
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dict_type)
+        cv2.aruco.getPredefinedDictionary(dict_type)
     except AttributeError:
         print("Error: Could not initialize ArUco detector.")
         print("Please ensure you have 'opencv-contrib-python' installed.")
@@ -42,23 +153,25 @@ def generate_markers_and_map_nested(input_dir, output_dir, map_filename, dict_ty
         print(f"Error: Input folder not found at: '{input_dir}'")
         return
 
-    # 3. Create the *root* output folder if it doesn't exist
-    if not os.path.exists(output_dir):
+    # 3. Create the folder for the output archive if it doesn't exist
+    output_dir = os.path.dirname(output_archive)
+    if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
-        print(f"Created root output folder: '{output_dir}'")
+        print(f"Created output folder: '{output_dir}'")
 
     valid_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
     image_to_marker_map = {}
+    tasks = [] # (marker_id, member_name) for every marker to generate
     current_marker_id = 0 # This ID increments for *every* image, staying unique
 
     print(f"Scanning '{input_dir}' and all subfolders...")
 
-    # 4. Use os.walk() to go through all subfolders
-    #    This is the key difference!
-    for dirpath, dirnames, filenames in os.walk(input_dir):
+    # 4. Go through every image in all subfolders
+    current_subfolder = None
+    for image_path in iter_images(input_dir, valid_extensions):
         
-        # dirpath = full path to current folder (e.g., ".../ID_cards/IBOT_CLUB")
-        # filenames = list of files in that folder (e.g., ["Aurovind.jpg"])
+        # image_path = full path to an image (e.g., ".../ID_cards/IBOT_CLUB/Aurovind.jpg")
+        dirpath, filename = os.path.split(image_path)
         
         # 5. Determine the relative subfolder path (e.g., "IBOT_CLUB")
         relative_subfolder = os.path.relpath(dirpath, input_dir)
@@ -68,71 +181,77 @@ def generate_markers_and_map_nested(input_dir, output_dir, map_filename, dict_ty
         if relative_subfolder == ".":
             continue
             
-        # 6. Create the matching subfolder in the output directory
-        target_marker_dir = os.path.join(output_dir, relative_subfolder)
-        if not os.path.exists(target_marker_dir):
-            os.makedirs(target_marker_dir)
+        # 6. Announce each new subfolder once, at its first image
+        if relative_subfolder != current_subfolder:
+            current_subfolder = relative_subfolder
+            print(f"\n--- Scanning subfolder: {relative_subfolder} ---")
             
-        print(f"\n--- Scanning subfolder: {relative_subfolder} ---")
+        # 7. Queue the marker for this image
+        base_name = os.path.splitext(filename)[0]
+        marker_filename = f"{base_name}.png"
         
-        if not filenames:
-            print("   - No image files found here.")
-            continue
+        # It will be stored in the matching subfolder of the archive
+        relative_marker_dir = relative_subfolder.replace("\\", "/")
+        member_name = f"{relative_marker_dir}/{marker_filename}"
+        tasks.append((current_marker_id, member_name))
+
+        # 8. Add the link to our map
+        # We map the ID to the *relative path* of the original file
+        # e.g., "0": "IBOT_CLUB/Aurovind_Sadangi.jpg"
+        relative_image_path = f"{relative_marker_dir}/{filename}"
+        image_to_marker_map[str(current_marker_id)] = relative_image_path
         
-        for filename in sorted(filenames):
-            # Check if the file is a valid image
-            if not filename.lower().endswith(valid_extensions):
-                continue 
-            
-            # 7. Generate the marker image
-            marker_image = np.zeros((MARKER_SIZE_PX, MARKER_SIZE_PX), dtype=np.uint8)
-            marker_image = cv2.aruco.generateImageMarker(
-                aruco_dict, 
-                current_marker_id, 
-                MARKER_SIZE_PX
-            )
-            
-            # Add a white border (padding)
-            padded_image = cv2.copyMakeBorder(
-                marker_image, 50, 50, 50, 50, 
-                cv2.BORDER_CONSTANT, value=[255, 255, 255]
-            )
-            
-            # 8. Save the new marker image
-            base_name = os.path.splitext(filename)[0]
-            marker_filename = f"{base_name}.png"
-            
-            # Save it inside the new target subfolder
-            output_path = os.path.join(target_marker_dir, marker_filename)
-            cv2.imwrite(output_path, padded_image)
-
-            # 9. Add the link to our map
-            # We map the ID to the *relative path* of the original file
-            # e.g., "0": "IBOT_CLUB/Aurovind_Sadangi.jpg"
-            relative_image_path = os.path.join(relative_subfolder, filename).replace("\\", "/")
-            image_to_marker_map[str(current_marker_id)] = relative_image_path
-            
-            print(f"   - Generated {marker_filename} (ID: {current_marker_id}) for {relative_image_path}")
-            
-            # 10. Increment the ID for the next image
-            current_marker_id += 1
+        print(f"   - Queued {marker_filename} (ID: {current_marker_id}) for {relative_image_path}")
+        
+        # 9. Increment the ID for the next image
+        current_marker_id += 1
 
     if not image_to_marker_map:
         print(f"No images found in any subfolders of '{input_dir}'. No map was created.")
         return
 
+    # 10. Generate all markers in parallel, one process per core.
+    #     A single writer thread stores them in the archive (one
+    #     sequential file write), overlapping with the encoding of the
+    #     next markers. PNGs are already compressed, so ZIP_STORED.
+    with zipfile.ZipFile(output_archive, "w", compression=zipfile.ZIP_STORED) as archive:
+        write_queue = queue.Queue(maxsize=32)
+        failed = [] # Member names the writer could not store
+        writer = threading.Thread(target=_archive_writer, args=(write_queue, archive, failed), daemon=True)
+        writer.start()
+
+        print(f"\nGenerating {len(tasks)} markers on {mp.cpu_count()} processes...")
+        try:
+            with mp.Pool(mp.cpu_count(), initializer=_init_worker, initargs=(dict_type,)) as pool:
+                results = pool.imap_unordered(_generate_one, tasks, chunksize=16)
+                for done, (marker_id, member_name, png_bytes) in enumerate(results, 1):
+                    write_queue.put((member_name, png_bytes))
+                    print(f"   - [{done}/{len(tasks)}] Generated {member_name} (ID: {marker_id})")
+        finally:
+            # Wait for every queued marker to be stored, then stop the writer
+            write_queue.put(None)
+            write_queue.join()
+            writer.join()
+
+    if failed:
+        print(f"\nError: {len(failed)} of {len(tasks)} markers could not be saved to '{output_archive}'.")
+        print(f"The map '{map_filename}' was not written. Fix the problem and run again.")
+        return
+
     # 11. Save the completed map to a JSON file
     with open(map_filename, 'w') as f:
         json.dump(image_to_marker_map, f, indent=4)
 
     print(f"\nSuccess! Map saved to '{map_filename}'")
-    print(f"All marker images saved in '{output_dir}' in their respective subfolders.")
+    print(f"All marker images saved in '{output_archive}' in their respective subfolders.")
 
 # --- Main execution ---
 if __name__ == "__main__":
+    # Use the same start method on every platform (the Windows default)
+    mp.set_start_method("spawn")
     generate_markers_and_map_nested(
         INPUT_FOLDER, 
-        MARKER_OUTPUT_FOLDER, 
+        MARKER_ARCHIVE, 
         MAP_FILE, 
         ARUCO_DICTIONARY_TYPE
     )
\ No newline at end of file
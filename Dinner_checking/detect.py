@@ -1,7 +1,10 @@
 import cv2
 import os
-import json
+import sys
+import threading
+import orjson
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 # 1. The folder with your original JPGs 
@@ -16,24 +19,82 @@ ARUCO_DICTIONARY_TYPE = cv2.aruco.DICT_6X6_250
 # 4. Size for the display window
 DISPLAY_WINDOW_HEIGHT = 600
 DISPLAY_WINDOW_WIDTH = 800
+
+# 5. Number of threads used to load the images at startup
+LOAD_WORKERS = 8
+
+# 6. Camera frames wider than this are downscaled (keeping their aspect
+#    ratio) before marker detection. Markers held up to the camera are
+#    still found reliably, and detection is much cheaper.
+DETECTION_WIDTH = 640
+
+# 7. Run marker detection only on every Nth frame. The shown ID rarely
+#    changes between frames, so skipped frames keep the last result.
+DETECT_EVERY_N_FRAMES = 2
+
+# 8. Camera settings. MJPG makes the camera compress frames on-chip, so
+#    far less data crosses USB than with raw YUYV, and higher frame rates
+#    become possible.
+CAMERA_INDEX = 0
+CAMERA_FPS = 60
 # ---------------------
 
+def compose_display(image):
+    """
+    Builds the full display-window canvas for an image: the image is
+    resized to fit (keeping its aspect ratio) and centered on black.
+    """
+    canvas = np.zeros(
+        (DISPLAY_WINDOW_HEIGHT, DISPLAY_WINDOW_WIDTH, 3), 
+        dtype=np.uint8
+    )
+    
+    img_h, img_w = image.shape[:2]
+    scale = min(DISPLAY_WINDOW_HEIGHT / img_h, DISPLAY_WINDOW_WIDTH / img_w)
+    
+    new_w = int(img_w * scale)
+    new_h = int(img_h * scale)
+    
+    resized_img = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    
+    y_offset = (DISPLAY_WINDOW_HEIGHT - new_h) // 2
+    x_offset = (DISPLAY_WINDOW_WIDTH - new_w) // 2
+    
+    canvas[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized_img
+    return canvas
+
+def capture_frames(cap, latest, frame_ready, stop):
+    """
+    Capture thread: keeps reading the camera and stores only the newest
+    frame in latest[0] ("last frame wins"), so detection always works on
+    a fresh frame. Sets 'stop' when the camera stops delivering frames.
+    """
+    while not stop.is_set():
+        ret, frame = cap.read()
+        with frame_ready:
+            if ret:
+                latest[0] = frame
+            else:
+                stop.set()
+            frame_ready.notify()
+
 def load_resources(map_filepath, image_folder_path):
     """
-    Loads the JSON map and all the image assets into memory.
-    Returns a dictionary: { 0: image_data, 1: image_data, ... }
+    Loads the JSON map and all the image assets into memory, each one
+    already composed onto a display-window canvas (see compose_display).
+    Returns a dictionary: { 0: display_canvas, 1: display_canvas, ... }
     """
     
     # 1. Load the JSON map
     print(f"Loading map from '{map_filepath}'...")
     try:
-        with open(map_filepath, 'r') as f:
-            json_map = json.load(f)
+        with open(map_filepath, 'rb') as f:
+            json_map = orjson.loads(f.read())
     except FileNotFoundError:
         print(f"Error: Map file not found at '{map_filepath}'")
         print("Please run the 'create_map.py' script first.")
         return None
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print(f"Error: Could not read the map file '{map_filepath}'. It might be empty or corrupt.")
         return None
         
@@ -46,22 +107,35 @@ def load_resources(map_filepath, image_folder_path):
     print(f"Loading image assets from '{image_folder_path}'...")
     image_asset_map = {}
     
+    items = []
     for marker_id_str, filename in json_map.items():
         try:
-            marker_id_int = int(marker_id_str)
-            image_path = os.path.join(image_folder_path, filename)
-            
-            image = cv2.imread(image_path)
-            if image is not None:
-                image_asset_map[marker_id_int] = image
-                print(f"  - Loaded '{filename}' for ID {marker_id_int}")
-            else:
-                print(f"  - Warning: Could not load image '{filename}' at '{image_path}'")
-                
+            items.append((int(marker_id_str), filename))
         except ValueError:
             print(f"  - Warning: Invalid ID '{marker_id_str}' in map file. Skipping.")
-        except Exception as e:
-            print(f"  - Error loading {filename}: {e}")
+
+    def read_image(filename):
+        # cv2.imread/resize release the GIL, so threads overlap
+        image = cv2.imread(os.path.join(image_folder_path, filename))
+        if image is None:
+            return None
+        return compose_display(image)
+
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        futures = [executor.submit(read_image, filename) for _, filename in items]
+
+        for (marker_id_int, filename), future in zip(items, futures):
+            try:
+                display_image = future.result()
+                if display_image is not None:
+                    image_asset_map[marker_id_int] = display_image
+                    print(f"  - Loaded '{filename}' for ID {marker_id_int}")
+                else:
+                    image_path = os.path.join(image_folder_path, filename)
+                    print(f"  - Warning: Could not load image '{filename}' at '{image_path}'")
+                    
+            except Exception as e:
+                print(f"  - Error loading {filename}: {e}")
             
     if not image_asset_map:
         print("Error: No images were successfully loaded. Check your map file and folder.")
@@ -75,84 +149,129 @@ def main():
     if image_map is None:
         return
 
+    # Dense ID -> canvas index lookup table (-1 = not mapped), so each
+    # frame does an array index instead of a dict lookup
+    canvases = [image_map[marker_id] for marker_id in sorted(image_map)]
+    id_to_idx = np.full(max(image_map) + 1, -1, dtype=np.int32)
+    for idx, marker_id in enumerate(sorted(image_map)):
+        if marker_id >= 0:
+            id_to_idx[marker_id] = idx
+
     # 2. Initialize ArUco detector
     try:
         aruco_dict = cv2.aruco.getPredefinedDictionary(ARUCO_DICTIONARY_TYPE)
         aruco_params = cv2.aruco.DetectorParameters()
+        
+        # Tuned for speed: ID cards are held close to the camera, so
+        # markers are large and need no sub-pixel corner accuracy.
+        aruco_params.minMarkerPerimeterRate = 0.1
+        aruco_params.adaptiveThreshWinSizeMin = 13
+        aruco_params.adaptiveThreshWinSizeMax = 23
+        aruco_params.adaptiveThreshWinSizeStep = 10
+        aruco_params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
+        aruco_params.useAruco3Detection = True
+        
         detector = cv2.aruco.ArucoDetector(aruco_dict, aruco_params)
     except AttributeError:
         print("Error: Could not initialize ArUco detector.")
         print("Please ensure you have 'opencv-contrib-python' installed.")
         return
 
-    # 3. Start video camera
-    cap = cv2.VideoCapture(0)
+    # 3. Start video camera with the native backend of this platform
+    if sys.platform.startswith("win"):
+        backend = cv2.CAP_MSMF
+    elif sys.platform.startswith("linux"):
+        backend = cv2.CAP_V4L2
+    else:
+        backend = cv2.CAP_ANY
+    cap = cv2.VideoCapture(CAMERA_INDEX, backend)
     if not cap.isOpened():
         print("Error: Cannot open camera")
         return
 
-    # 4. Create a blank black canvas for our display window
-    display_canvas = np.zeros(
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) # Drop stale frames instead of queueing them
+
+    # Read the camera on its own thread so cap.read() never waits on detection
+    latest = [None]
+    frame_ready = threading.Condition()
+    stop = threading.Event()
+    capture_thread = threading.Thread(
+        target=capture_frames, args=(cap, latest, frame_ready, stop), daemon=True
+    )
+    capture_thread.start()
+
+    # 4. Build the "Scan" canvas once, shown while no mapped marker is found
+    scan_canvas = np.zeros(
         (DISPLAY_WINDOW_HEIGHT, DISPLAY_WINDOW_WIDTH, 3), 
         dtype=np.uint8
     )
-    cv2.imshow("AR Display", display_canvas) # Create the window
+    cv2.putText(
+        scan_canvas, 
+        "Scan an ArUco Code", 
+        (50, DISPLAY_WINDOW_HEIGHT // 2), 
+        cv2.FONT_HERSHEY_SIMPLEX, 
+        1.5, (255, 255, 255), 3
+    )
+    cv2.imshow("AR Display", scan_canvas) # Create the window
 
     print("\nCamera started. Show a printed ArUco marker to the camera.")
     print("Press 'q' to quit.")
 
+    small_buf = None # Downscaled frame, reused across iterations
+    gray_buf = None  # Grayscale detector input, reused across iterations
+    frame_idx = 0
+    current_display = scan_canvas
+
     while True:
-        # Read a frame from the camera
-        ret, frame = cap.read()
-        if not ret:
+        # Take the newest frame from the capture thread
+        with frame_ready:
+            while latest[0] is None and not stop.is_set():
+                frame_ready.wait()
+            frame, latest[0] = latest[0], None
+        if frame is None:
             break
 
-        # Detect markers in the frame
-        corners, ids, rejected = detector.detectMarkers(frame)
+        # On skipped frames, keep showing the last detection result
+        run_detection = frame_idx % DETECT_EVERY_N_FRAMES == 0
+        frame_idx += 1
+
+        if run_detection:
+            # Detect markers in a downscaled grayscale copy of the frame.
+            # The buffers are reused from frame to frame once allocated.
+            frame_h, frame_w = frame.shape[:2]
+            scale = min(1.0, DETECTION_WIDTH / frame_w)
+            if scale < 1.0:
+                small_buf = cv2.resize(
+                    frame, (DETECTION_WIDTH, int(frame_h * scale)),
+                    dst=small_buf, interpolation=cv2.INTER_AREA
+                )
+                detection_input = small_buf
+            else:
+                detection_input = frame
+            gray_buf = cv2.cvtColor(detection_input, cv2.COLOR_BGR2GRAY, dst=gray_buf)
+        
+            corners, ids, rejected = detector.detectMarkers(gray_buf)
+            if scale < 1.0:
+                # Map the corners back to full-frame coordinates for drawing
+                corners = tuple(c / scale for c in corners)
         
-        # Reset the display to black
-        current_display = display_canvas.copy()
-        found_mapped_marker = False
+            # Show the "Scan" canvas unless a *mapped* marker is found
+            current_display = scan_canvas
 
-        if ids is not None:
-            # Draw borders around detected markers on the camera feed
-            cv2.aruco.drawDetectedMarkers(frame, corners, ids)
+            if ids is not None:
+                # Draw borders around detected markers on the camera feed
+                cv2.aruco.drawDetectedMarkers(frame, corners, ids)
             
-            # Use the first detected ID
-            first_id = ids[0][0]
+                # Use the first detected ID
+                first_id = ids[0][0]
             
-            # Check if this ID is in our map
-            if first_id in image_map:
-                found_mapped_marker = True
-                image_to_show = image_map[first_id]
-                
-                # --- Resize and center the image ---
-                img_h, img_w = image_to_show.shape[:2]
-                disp_h, disp_w = current_display.shape[:2]
-
-                scale = min(disp_h / img_h, disp_w / img_w)
-                
-                new_w = int(img_w * scale)
-                new_h = int(img_h * scale)
-                
-                resized_img = cv2.resize(image_to_show, (new_w, new_h))
-                
-                y_offset = (disp_h - new_h) // 2
-                x_offset = (disp_w - new_w) // 2
-                
-                # Place the image onto the black canvas
-                current_display[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized_img
-                # -------------------------------------
-
-        if not found_mapped_marker:
-            # If no *mapped* marker is found, show "Scan" text
-            cv2.putText(
-                current_display, 
-                "Scan an ArUco Code", 
-                (50, DISPLAY_WINDOW_HEIGHT // 2), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                1.5, (255, 255, 255), 3
-            )
+                # Check if this ID is in our map
+                idx = id_to_idx[first_id] if 0 <= first_id < id_to_idx.size else -1
+                if idx >= 0:
+                    # The canvas is precomposed, so no copy or paste is needed
+                    current_display = canvases[idx]
 
         # Show the camera feed and the AR display
         cv2.imshow("Camera Feed", frame)
@@ -163,6 +282,8 @@ def main():
             break
 
     # Clean up
+    stop.set()
+    capture_thread.join()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -1,11 +1,20 @@
 import cv2
 import os
 import re
-import pytesseract
 import shutil
-from thefuzz import process, fuzz
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from tesserocr import PyTessBaseAPI, PSM
+from rapidfuzz import process, fuzz, utils
 import numpy as np
 
+# Optional: libjpeg-turbo bindings for faster, scaled JPEG decoding
+try:
+    from turbojpeg import TurboJPEG
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _turbo_jpeg = None
+
 # --- Configuration ---
 
 # 1. SET THIS TO FALSE to run the script silently without pop-ups.
@@ -35,35 +44,166 @@ CLUB_ROI = {
 # 5. Your fine-tuned match threshold.
 MATCH_THRESHOLD = 40
 
+# 6. Cards are decoded at 1/DECODE_SCALE resolution (1, 2, 4 or 8), since
+#    only the small club box is needed. CLUB_ROI stays in full-size pixels.
+DECODE_SCALE = 2
+
+# 7. Resolution Tesseract is told the club crop has. This replaces
+#    upscaling the crop before OCR.
+OCR_DPI = 300
+
 # ---------------------
 
 # --- Tesseract Configuration ---
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Folder containing Tesseract's language data (eng.traineddata)
+TESSDATA_PATH = r'C:\Program Files\Tesseract-OCR\tessdata'
+
+# Tesseract instance of the current process, created on first use
+_tess_api = None
+
+def get_tess_api():
+    """
+    Returns this process's Tesseract instance, creating it on first use.
+    (PSM 6 = assume a single uniform block of text)
+    """
+    global _tess_api
+    if _tess_api is None:
+        _tess_api = PyTessBaseAPI(path=TESSDATA_PATH, psm=PSM.SINGLE_BLOCK)
+        _tess_api.SetVariable("user_defined_dpi", str(OCR_DPI))
+    return _tess_api
+
+# Characters that are not allowed in folder names
+_SANITIZE_RE = re.compile(r'[^a-zA-Z0-9 ]')
 
 def sanitize_foldername(name_text):
     """Cleans the text to make a valid folder name."""
-    clean_name = re.sub(r'[^a-zA-Z0-9 ]', '', name_text).strip()
-    return clean_name.replace(" ", "_")
+    return _SANITIZE_RE.sub('', name_text).strip().replace(" ", "_")
+
+# OpenCV flags that decode an image directly at reduced size
+_REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def read_card(file_path, scale):
+    """
+    Reads an ID card at 1/scale of its size. JPEGs are decoded scaled
+    down by libjpeg(-turbo) itself, which skips most of the IDCT work.
+    Returns None if the image cannot be decoded.
+    """
+    with open(file_path, 'rb') as f:
+        buf = f.read()
+
+    if _turbo_jpeg is not None and buf[:2] == b'\xff\xd8':
+        return _turbo_jpeg.decode(buf, scaling_factor=(1, scale))
+
+    return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), _REDUCED_READ_FLAGS[scale])
+
+# Preprocessing buffers, sized for the CLUB_ROI crop and reused on every
+# call (each worker process has its own copy). A crop of another size
+# still works: OpenCV then allocates new outputs instead.
+_roi_h = CLUB_ROI["y2"] // DECODE_SCALE - CLUB_ROI["y1"] // DECODE_SCALE
+_roi_w = CLUB_ROI["x2"] // DECODE_SCALE - CLUB_ROI["x1"] // DECODE_SCALE
+_gray = np.empty((_roi_h, _roi_w), dtype=np.uint8)
+_binarized = np.empty_like(_gray)
+_inverted = np.empty_like(_gray)
 
 def preprocess_for_ocr(image_crop):
     """
     Cleans a crop segment to make it easier for Tesseract to read.
+    The crop is not upscaled; Tesseract is given OCR_DPI instead.
+    The result is a shared buffer, overwritten by the next call.
     """
-    gray = cv2.cvtColor(image_crop, cv2.COLOR_BGR2GRAY)
-    gray_resized = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    (thresh, binarized) = cv2.threshold(gray_resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    inverted = cv2.bitwise_not(binarized)
+    gray = cv2.cvtColor(image_crop, cv2.COLOR_BGR2GRAY, dst=_gray)
+    (thresh, binarized) = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=_binarized)
+    inverted = cv2.bitwise_not(binarized, dst=_inverted)
     return inverted
 
+def iter_top_level_images(root, valid_extensions):
+    """
+    Yields the bare file names of the images directly inside 'root', in
+    sorted order. Club subfolders created by earlier runs are not entered,
+    so already-sorted cards are left alone.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith(valid_extensions):
+            yield entry.name
+
+def _classify_one(file_path, roi, clubs, threshold):
+    """
+    Reads one ID card, OCRs its club box and fuzzy-matches the text.
+    Returns (file_path, ocr_text, best_match, error). 'best_match' is None
+    if no club scores at least 'threshold'; 'error' is a message if the
+    card could not be processed, else None.
+    """
+    filename = os.path.basename(file_path)
+
+    try:
+        img = read_card(file_path, DECODE_SCALE)
+        if img is None:
+            return file_path, None, None, f"Could not read image {filename}. Skipping."
+
+        # 1. Crop the image to the club ROI (scaled to the decoded size)
+        y1, y2 = roi["y1"] // DECODE_SCALE, roi["y2"] // DECODE_SCALE
+        x1, x2 = roi["x1"] // DECODE_SCALE, roi["x2"] // DECODE_SCALE
+        club_crop = img[y1:y2, x1:x2]
+        
+        # --- PRE-PROCESSING STEP ---
+        processed_crop = preprocess_for_ocr(club_crop)
+        # ---------------------------
+
+        # --- DEBUG MODE (Now skipped) ---
+        if DEBUG_MODE:
+            print(f"\n[DEBUG] Processing {filename}")
+            print("Showing original crop (left) and processed (right).")
+            print("  ==> Press 'q' in the window to continue. <==")
+            
+            original_debug = cv2.resize(club_crop, (processed_crop.shape[1], processed_crop.shape[0]))
+            processed_debug_color = cv2.cvtColor(processed_crop, cv2.COLOR_GRAY2BGR)
+            debug_image = np.hstack((original_debug, processed_debug_color))
+            
+            cv2.imshow("Debug - Original vs Processed", debug_image)
+            
+            # --- BUG FIX ---
+            # Wait until user presses 'q' (not equal to)
+            while cv2.waitKey(0) != ord('q'):
+                pass
+            cv2.destroyWindow("Debug - Original vs Processed")
+        # --- END DEBUG MODE ---
+
+        # 2. Read text from the *processed* image.
+        api = get_tess_api()
+        crop_h, crop_w = processed_crop.shape[:2]
+        api.SetImageBytes(processed_crop.tobytes(), crop_w, crop_h, 1, crop_w)
+        ocr_text = api.GetUTF8Text().strip().upper()
+
+        if not ocr_text:
+            return file_path, ocr_text, None, f"No text detected in {filename}. Skipping."
+
+        # 3. Find the best match from our KNOWN_CLUBS list.
+        #    score_cutoff lets rapidfuzz skip clubs that cannot reach it;
+        #    default_process normalises case/punctuation like thefuzz did.
+        best_match = process.extractOne(
+            ocr_text, clubs, scorer=fuzz.ratio,
+            processor=utils.default_process, score_cutoff=threshold
+        )
+        return file_path, ocr_text, best_match, None
+
+    except Exception as e:
+        return file_path, None, None, f"Error processing {filename}: {e}"
+
 def sort_images_by_club_validated(source_dir, roi, clubs, threshold):
     print(f"Scanning folder: {source_dir}...")
     
     valid_extensions = ('.png', '.jpg', '.jpeg')
     
     try:
-        filenames = [f for f in os.listdir(source_dir) 
-                     if os.path.isfile(os.path.join(source_dir, f)) 
-                     and f.lower().endswith(valid_extensions)]
+        filenames = list(iter_top_level_images(source_dir, valid_extensions))
     except FileNotFoundError:
         print(f"Error: Source folder not found at {source_dir}")
         return
@@ -72,80 +212,53 @@ def sort_images_by_club_validated(source_dir, roi, clubs, threshold):
         print("No image files found in the source folder.")
         return
 
-    for filename in filenames:
-        old_file_path = os.path.join(source_dir, filename)
+    file_paths = [os.path.join(source_dir, filename) for filename in filenames]
+    classify = partial(_classify_one, roi=roi, clubs=clubs, threshold=threshold)
 
-        try:
-            img = cv2.imread(old_file_path)
-            if img is None:
-                print(f"  - Could not read image {filename}. Skipping.")
-                continue
+    # Cards are classified in parallel, one process per core. Files are
+    # only moved here, in the parent, so workers never race on the folders.
+    # DEBUG_MODE needs the pop-up windows, so it stays in this process.
+    executor = None
+    if DEBUG_MODE:
+        results = map(classify, file_paths)
+    else:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+        results = executor.map(classify, file_paths, chunksize=8)
 
-            # 1. Crop the image to the club ROI
-            y1, y2 = roi["y1"], roi["y2"]
-            x1, x2 = roi["x1"], roi["x2"]
-            club_crop = img[y1:y2, x1:x2]
-            
-            # --- PRE-PROCESSING STEP ---
-            processed_crop = preprocess_for_ocr(club_crop)
-            # ---------------------------
-
-            # --- DEBUG MODE (Now skipped) ---
-            if DEBUG_MODE:
-                print(f"\n[DEBUG] Processing {filename}")
-                print("Showing original crop (left) and processed (right).")
-                print("  ==> Press 'q' in the window to continue. <==")
-                
-                original_debug = cv2.resize(club_crop, (processed_crop.shape[1], processed_crop.shape[0]))
-                processed_debug_color = cv2.cvtColor(processed_crop, cv2.COLOR_GRAY2BGR)
-                debug_image = np.hstack((original_debug, processed_debug_color))
-                
-                cv2.imshow("Debug - Original vs Processed", debug_image)
-                
-                # --- BUG FIX ---
-                # Wait until user presses 'q' (not equal to)
-                while cv2.waitKey(0) != ord('q'):
-                    pass
-                cv2.destroyWindow("Debug - Original vs Processed")
-            # --- END DEBUG MODE ---
-
-            # 2. Read text from the *processed* image.
-            config = "--psm 6" 
-            ocr_text = pytesseract.image_to_string(processed_crop, config=config)
-            ocr_text = ocr_text.strip().upper()
-
-            if not ocr_text:
-                print(f"  - No text detected in {filename}. Skipping.")
+    try:
+        for old_file_path, ocr_text, best_match, error in results:
+            filename = os.path.basename(old_file_path)
+
+            if error:
+                print(f"  - {error}")
                 continue
 
-            # 3. Find the best match from our KNOWN_CLUBS list
-            best_match = process.extractOne(ocr_text, clubs, scorer=fuzz.ratio)
-            
-            if best_match and best_match[1] >= threshold:
-                # 4. We have a confident match!
-                folder_name_base = best_match[0]
-                folder_name = sanitize_foldername(folder_name_base)
-                
-                # 5. Create folder
-                target_folder_path = os.path.join(source_dir, folder_name)
-                if not os.path.exists(target_folder_path):
-                    os.makedirs(target_folder_path)
-                    print(f"  + Created new folder: {folder_name}")
-                
-                # 6. Move the file
-                new_file_path = os.path.join(target_folder_path, filename)
-                shutil.move(old_file_path, new_file_path)
-                print(f"  -> Match: '{ocr_text}' -> '{folder_name}'. Moved {filename}.")
-
-            else:
-                # 7. Match is too poor.
+            try:
                 if best_match:
-                    print(f"  - No match for '{ocr_text}' (Best: '{best_match[0]}' @ {best_match[1]}%). Skipping {filename}.")
+                    # 4. We have a confident match!
+                    folder_name_base = best_match[0]
+                    folder_name = sanitize_foldername(folder_name_base)
+                    
+                    # 5. Create folder
+                    target_folder_path = os.path.join(source_dir, folder_name)
+                    if not os.path.exists(target_folder_path):
+                        os.makedirs(target_folder_path)
+                        print(f"  + Created new folder: {folder_name}")
+                    
+                    # 6. Move the file
+                    new_file_path = os.path.join(target_folder_path, filename)
+                    shutil.move(old_file_path, new_file_path)
+                    print(f"  -> Match: '{ocr_text}' -> '{folder_name}'. Moved {filename}.")
+
                 else:
-                    print(f"  - No match for '{ocr_text}'. Skipping {filename}.")
+                    # 7. Match is too poor.
+                    print(f"  - No match for '{ocr_text}' (no club scored {threshold}% or more). Skipping {filename}.")
 
-        except Exception as e:
-            print(f"  - Error processing {filename}: {e}")
+            except Exception as e:
+                print(f"  - Error processing {filename}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
 # --- Main execution ---
 if __name__ == "__main__":